@@ -0,0 +1,104 @@
+"""Async variant of the OpenAI-compatible chat completions client.
+
+Built on aiohttp so several vision requests can be in flight at once;
+used by ``VisionScraper.scrape_and_analyze_many`` to overlap screenshot
+and LLM latency across a batch of URLs.
+"""
+
+import asyncio
+import os
+
+import aiohttp
+
+from openai_client import (
+    DEFAULT_BASE_URL,
+    DEFAULT_MODEL,
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    _decode_completion,
+    _json_dumps,
+)
+
+
+class AsyncChatCompletions:
+    def __init__(self, client):
+        self._client = client
+
+    async def create(self, messages, model=None, max_tokens=None, temperature=None):
+        return await self._client._make_chat_request(
+            messages, model=model, max_tokens=max_tokens, temperature=temperature
+        )
+
+
+class AsyncChat:
+    def __init__(self, client):
+        self.completions = AsyncChatCompletions(client)
+
+
+class AsyncCustomOpenAIClient:
+    def __init__(
+        self,
+        api_key=None,
+        base_url=None,
+        model=None,
+        max_tokens=1000,
+        temperature=0.1,
+    ):
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.base_url = (
+            base_url or os.environ.get("OPENAI_BASE_URL") or DEFAULT_BASE_URL
+        ).rstrip("/")
+        self.model = model or os.environ.get("OPENAI_MODEL") or DEFAULT_MODEL
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+        # The ClientSession must be created inside a running event loop,
+        # so it is built lazily on first request.
+        self._session = None
+        self.chat = AsyncChat(self)
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=32, limit_per_host=8),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+                timeout=aiohttp.ClientTimeout(total=60),
+            )
+        return self._session
+
+    async def _make_chat_request(self, messages, model=None, max_tokens=None, temperature=None):
+        payload = {
+            "model": model or self.model,
+            "messages": messages,
+            "max_tokens": max_tokens if max_tokens is not None else self.max_tokens,
+            "temperature": temperature if temperature is not None else self.temperature,
+        }
+        session = self._get_session()
+        try:
+            async with session.post(
+                f"{self.base_url}/chat/completions", data=_json_dumps(payload)
+            ) as response:
+                response.raise_for_status()
+                return _decode_completion(await response.read())
+        except asyncio.TimeoutError as e:
+            raise APITimeoutError(f"Chat completion timed out: {e}") from e
+        except aiohttp.ClientResponseError as e:
+            raise APIStatusError(
+                f"Chat completion returned HTTP {e.status}", status_code=e.status
+            ) from e
+        except aiohttp.ClientError as e:
+            raise APIConnectionError(f"Chat completion request failed: {e}") from e
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
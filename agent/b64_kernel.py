@@ -0,0 +1,77 @@
+"""Fused base64 + data-URL builder.
+
+With Numba installed, ``build_data_url`` emits the
+``data:image/jpeg;base64,`` prefix and the base64 encoding of the JPEG
+in a single compiled pass over one preallocated buffer, so the payload
+is touched once instead of encode-then-concat. Without Numba it falls
+back to a plain bytes concat on top of pybase64/stdlib base64.
+"""
+
+DATA_URL_PREFIX = b"data:image/jpeg;base64,"
+
+try:
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
+
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = None
+
+if np is not None:
+    _ALPHABET = np.frombuffer(
+        b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/",
+        dtype=np.uint8,
+    )
+    _PREFIX = np.frombuffer(DATA_URL_PREFIX, dtype=np.uint8)
+
+    @njit(cache=True)
+    def _encode_with_prefix(src, prefix, out):
+        for i in range(prefix.shape[0]):
+            out[i] = prefix[i]
+        size = src.shape[0]
+        full = size // 3
+        o = prefix.shape[0]
+        for i in range(full):
+            b0 = src[3 * i]
+            b1 = src[3 * i + 1]
+            b2 = src[3 * i + 2]
+            out[o] = _ALPHABET[b0 >> 2]
+            out[o + 1] = _ALPHABET[((b0 & 0x03) << 4) | (b1 >> 4)]
+            out[o + 2] = _ALPHABET[((b1 & 0x0F) << 2) | (b2 >> 6)]
+            out[o + 3] = _ALPHABET[b2 & 0x3F]
+            o += 4
+        rem = size - full * 3
+        if rem == 1:
+            b0 = src[size - 1]
+            out[o] = _ALPHABET[b0 >> 2]
+            out[o + 1] = _ALPHABET[(b0 & 0x03) << 4]
+            out[o + 2] = 61  # '='
+            out[o + 3] = 61
+            o += 4
+        elif rem == 2:
+            b0 = src[size - 2]
+            b1 = src[size - 1]
+            out[o] = _ALPHABET[b0 >> 2]
+            out[o + 1] = _ALPHABET[((b0 & 0x03) << 4) | (b1 >> 4)]
+            out[o + 2] = _ALPHABET[(b1 & 0x0F) << 2]
+            out[o + 3] = 61
+            o += 4
+        return o
+
+    def build_data_url(jpeg_bytes):
+        """Return the full data-URL str for raw JPEG bytes."""
+        src = np.frombuffer(jpeg_bytes, dtype=np.uint8)
+        out = np.empty(
+            _PREFIX.shape[0] + 4 * ((src.shape[0] + 2) // 3), dtype=np.uint8
+        )
+        end = _encode_with_prefix(src, _PREFIX, out)
+        return out[:end].tobytes().decode("ascii")
+
+else:
+
+    def build_data_url(jpeg_bytes):
+        """Return the full data-URL str for raw JPEG bytes."""
+        return (DATA_URL_PREFIX + _b64.b64encode(jpeg_bytes)).decode("ascii")
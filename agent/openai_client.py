@@ -0,0 +1,473 @@
+"""OpenAI-compatible chat completions client for the vision scraper.
+
+Mirrors the shape of the official ``openai`` client
+(``client.chat.completions.create(...)``) but talks to any
+OpenAI-compatible endpoint, configured the same way as the Node agent
+(``OPENAI_API_KEY`` / ``OPENAI_BASE_URL`` / ``OPENAI_MODEL`` in ``.env``).
+"""
+
+import atexit
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    # Rust JSON codec: much faster on the multi-megabyte base64 data
+    # URL than stdlib json, and dumps straight to bytes.
+    import orjson
+
+    def _json_dumps(obj):
+        return orjson.dumps(obj)
+
+    def _json_loads(data):
+        return orjson.loads(data)
+
+except ImportError:
+    import json
+
+    def _json_dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+
+    def _json_loads(data):
+        return json.loads(data)
+
+
+try:
+    # HTTP/2 transport; needs the h2 extra (httpx[http2]).
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+except ImportError:
+    pass
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+DEFAULT_MODEL = "gpt-4o"
+
+# Shared between the urllib3 Retry policy and the HTTP/2 retry loop.
+_RETRY_STATUS_CODES = frozenset((429, 500, 502, 503, 504))
+_RETRY_TOTAL = 4
+_RETRY_BACKOFF = 0.5
+
+
+def _error_message(response):
+    """Best-effort provider error message, bounded in cost and size.
+
+    Tries the fast JSON decoder first; anything that is not a JSON
+    error object (e.g. a big HTML 502 page) falls through to a 512-byte
+    snippet instead of being fully parsed or decoded.
+    """
+    if response is None:
+        return None
+    detail = None
+    try:
+        payload = _json_loads(response.content)
+        if isinstance(payload, dict):
+            error = payload.get("error")
+            if isinstance(error, dict):
+                detail = error.get("message")
+            elif isinstance(error, str):
+                # Some providers return {"error": "..."} directly
+                detail = error
+    except ValueError:
+        pass
+    if detail:
+        return detail
+    snippet = response.content[:512].decode("utf-8", errors="replace")
+    return f"HTTP {response.status_code}: {snippet}"
+
+
+class OpenAIClientError(Exception):
+    """Base class for client failures."""
+
+
+class APITimeoutError(OpenAIClientError):
+    """The request did not complete within the timeout."""
+
+
+class APIConnectionError(OpenAIClientError):
+    """The endpoint could not be reached."""
+
+
+class APIStatusError(OpenAIClientError):
+    """The endpoint answered with a non-2xx status."""
+
+    def __init__(self, message, status_code=None, response=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+
+
+class Message:
+    __slots__ = ("role", "content")
+
+    def __init__(self, data):
+        self.role = data.get("role")
+        self.content = data.get("content")
+
+
+class Choice:
+    __slots__ = ("_raw", "_message")
+
+    def __init__(self, data):
+        self._raw = data
+        self._message = None
+
+    @property
+    def index(self):
+        return self._raw.get("index", 0)
+
+    @property
+    def finish_reason(self):
+        return self._raw.get("finish_reason")
+
+    @property
+    def message(self):
+        if self._message is None:
+            self._message = Message(self._raw.get("message", {}))
+        return self._message
+
+
+class ChatCompletion:
+    """Thin slotted view over the raw response dict.
+
+    Wrapper objects are only allocated on first access (cached in a
+    slot, since ``functools.cached_property`` needs a ``__dict__``), so
+    a caller that reads ``choices[0].message.content`` never pays for
+    choices it ignores.
+    """
+
+    __slots__ = ("_raw", "_choices")
+
+    def __init__(self, data):
+        self._raw = data
+        self._choices = None
+
+    @property
+    def id(self):
+        return self._raw.get("id")
+
+    @property
+    def model(self):
+        return self._raw.get("model")
+
+    @property
+    def usage(self):
+        return self._raw.get("usage", {})
+
+    @property
+    def choices(self):
+        if self._choices is None:
+            self._choices = [Choice(choice) for choice in self._raw.get("choices", ())]
+        return self._choices
+
+
+try:
+    # Zero-copy response decoding: one pass from bytes straight into
+    # C-level slotted structs, skipping the intermediate dict and the
+    # Python wrapper allocations entirely.
+    import msgspec
+
+    class MessageS(msgspec.Struct, frozen=True):
+        content: str | None = None
+        role: str | None = None
+
+    class ChoiceS(msgspec.Struct, frozen=True):
+        index: int = 0
+        message: MessageS = MessageS()
+        finish_reason: str | None = None
+
+    class ChatCompletionS(msgspec.Struct, frozen=True):
+        id: str | None = None
+        model: str | None = None
+        choices: tuple[ChoiceS, ...] = ()
+        usage: dict | None = None
+
+    _completion_decoder = msgspec.json.Decoder(ChatCompletionS)
+
+    def _decode_completion(content):
+        return _completion_decoder.decode(content)
+
+except ImportError:
+
+    def _decode_completion(content):
+        return ChatCompletion(_json_loads(content))
+
+
+class Delta:
+    """One incremental chunk of a streamed completion."""
+
+    __slots__ = ("role", "content", "finish_reason")
+
+    def __init__(self, chunk):
+        choices = chunk.get("choices") or ({},)
+        first = choices[0]
+        delta = first.get("delta", {})
+        self.role = delta.get("role")
+        self.content = delta.get("content")
+        self.finish_reason = first.get("finish_reason")
+
+
+class ChatCompletions:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, messages, model=None, max_tokens=None, temperature=None, stream=False):
+        if stream:
+            return self._client._stream_chat_request(
+                messages, model=model, max_tokens=max_tokens, temperature=temperature
+            )
+        return self._client._make_chat_request(
+            messages, model=model, max_tokens=max_tokens, temperature=temperature
+        )
+
+
+class Chat:
+    def __init__(self, client):
+        self.completions = ChatCompletions(client)
+
+
+class CustomOpenAIClient:
+    def __init__(
+        self,
+        api_key=None,
+        base_url=None,
+        model=None,
+        max_tokens=1000,
+        temperature=0.1,
+        supports_multipart=None,
+    ):
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.base_url = (
+            base_url or os.environ.get("OPENAI_BASE_URL") or DEFAULT_BASE_URL
+        ).rstrip("/")
+        self.model = model or os.environ.get("OPENAI_MODEL") or DEFAULT_MODEL
+        # Repair out-of-range generation parameters once here instead
+        # of checking them on every call.
+        if not isinstance(max_tokens, int) or max_tokens <= 0:
+            max_tokens = 1000
+        self.max_tokens = max_tokens
+        self.temperature = min(max(float(temperature), 0.0), 2.0)
+        # Whether the endpoint exposes a /vision multipart route; only
+        # custom deployments do, so it is off unless configured.
+        if supports_multipart is None:
+            supports_multipart = os.environ.get(
+                "OPENAI_SUPPORTS_MULTIPART", ""
+            ).lower() in ("1", "true", "yes")
+        self.supports_multipart = supports_multipart
+
+        # Fixed for the client's lifetime, so built exactly once.
+        self._url = f"{self.base_url}/chat/completions"
+        self._headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "User-Agent": "CustomOpenAIClient/1.0",
+        }
+
+        # Pooled session: sequential completions hit the same host, so
+        # reuse the TCP+TLS connection instead of paying a fresh
+        # handshake per request. Headers are applied once here, not on
+        # every call.
+        self._session = requests.Session()
+        self._session.headers.update(self._headers)
+        # Transient 429/5xx responses are retried inside urllib3 with
+        # exponential backoff (and Retry-After honored), so the caller
+        # never re-pays the base64 encode for a flaky 502. POST must be
+        # opted in explicitly since it is not idempotent by default.
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(
+                total=_RETRY_TOTAL,
+                backoff_factor=_RETRY_BACKOFF,
+                status_forcelist=_RETRY_STATUS_CODES,
+                allowed_methods=frozenset(["POST"]),
+                respect_retry_after_header=True,
+            ),
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        # HTTP/2 transport when httpx + h2 are installed: multiplexed
+        # streams and HPACK-compressed headers over one TLS connection,
+        # which matters when an agent loop pipelines many completions.
+        # The requests session above stays as the fallback.
+        self._http = None
+        if httpx is not None:
+            try:
+                self._http = httpx.Client(
+                    http2=True,
+                    base_url=self.base_url,
+                    headers=self._headers,
+                    timeout=httpx.Timeout(60.0, connect=5.0),
+                    limits=httpx.Limits(
+                        max_keepalive_connections=8, max_connections=16
+                    ),
+                )
+            except ImportError:
+                # httpx present but the h2 package is not
+                self._http = None
+
+        self.chat = Chat(self)
+        atexit.register(self.close)
+
+    def _build_payload(self, messages, model=None, max_tokens=None, temperature=None, stream=False):
+        payload = {
+            "model": model or self.model,
+            "messages": messages,
+            "max_tokens": max_tokens if max_tokens is not None else self.max_tokens,
+            "temperature": temperature if temperature is not None else self.temperature,
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _make_chat_request(self, messages, model=None, max_tokens=None, temperature=None):
+        payload = self._build_payload(messages, model, max_tokens, temperature)
+        body = _json_dumps(payload)
+        if self._http is not None:
+            return self._make_chat_request_http2(body)
+        try:
+            # Preserialize once and send raw bytes; Content-Type is
+            # already fixed to application/json on the session headers.
+            response = self._session.post(self._url, data=body, timeout=60)
+            response.raise_for_status()
+        except requests.Timeout as e:
+            raise APITimeoutError(f"Chat completion timed out: {e}") from e
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            raise APIStatusError(
+                _error_message(e.response) or f"Chat completion returned HTTP {status}",
+                status_code=status,
+                response=e.response,
+            ) from e
+        except requests.RequestException as e:
+            raise APIConnectionError(f"Chat completion request failed: {e}") from e
+        return _decode_completion(response.content)
+
+    def _stream_chat_request(self, messages, model=None, max_tokens=None, temperature=None):
+        """Yield Delta objects as SSE frames arrive.
+
+        Time-to-first-token drops from full-generation latency to
+        roughly one RTT plus the first token. Streaming always rides
+        the requests session (chunked reads), regardless of the HTTP/2
+        transport; the read timeout is unbounded since generation can
+        legitimately be slow between tokens.
+        """
+        payload = self._build_payload(messages, model, max_tokens, temperature, stream=True)
+        try:
+            response = self._session.post(
+                self._url,
+                data=_json_dumps(payload),
+                stream=True,
+                timeout=(5, None),
+            )
+            response.raise_for_status()
+        except requests.Timeout as e:
+            raise APITimeoutError(f"Chat completion timed out: {e}") from e
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            raise APIStatusError(
+                _error_message(e.response) or f"Chat completion returned HTTP {status}",
+                status_code=status,
+                response=e.response,
+            ) from e
+        except requests.RequestException as e:
+            raise APIConnectionError(f"Chat completion request failed: {e}") from e
+        try:
+            for line in response.iter_lines():
+                if not line or not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    break
+                yield Delta(_json_loads(data))
+        finally:
+            response.close()
+
+    def analyze_image_multipart(self, jpeg_bytes, prompt, model=None, max_tokens=None):
+        """Send the JPEG as a multipart file part to the /vision route.
+
+        The image goes up raw (~25% fewer wire bytes than base64) and
+        is never base64-encoded at all. Only valid when the deployment
+        exposes the route; callers should check ``supports_multipart``
+        and fall back to the data-URL chat path otherwise.
+        """
+        files = {"image": ("screenshot.jpg", jpeg_bytes, "image/jpeg")}
+        data = {
+            "model": model or self.model,
+            "prompt": prompt,
+            "max_tokens": str(max_tokens if max_tokens is not None else self.max_tokens),
+        }
+        try:
+            # Drop the session's application/json Content-Type so
+            # requests can set the multipart boundary itself.
+            response = self._session.post(
+                f"{self.base_url}/vision",
+                headers={"Content-Type": None},
+                data=data,
+                files=files,
+                timeout=60,
+            )
+            response.raise_for_status()
+        except requests.Timeout as e:
+            raise APITimeoutError(f"Vision request timed out: {e}") from e
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            raise APIStatusError(
+                _error_message(e.response) or f"Vision request returned HTTP {status}",
+                status_code=status,
+                response=e.response,
+            ) from e
+        except requests.RequestException as e:
+            raise APIConnectionError(f"Vision request failed: {e}") from e
+        return _decode_completion(response.content)
+
+    def _make_chat_request_http2(self, body):
+        # httpx has no built-in status retries, so mirror the session's
+        # urllib3 policy here: same status codes, exponential backoff,
+        # Retry-After honored.
+        for attempt in range(_RETRY_TOTAL + 1):
+            try:
+                response = self._http.post("/chat/completions", content=body)
+            except httpx.TimeoutException as e:
+                raise APITimeoutError(f"Chat completion timed out: {e}") from e
+            except httpx.HTTPError as e:
+                raise APIConnectionError(f"Chat completion request failed: {e}") from e
+            if response.status_code in _RETRY_STATUS_CODES and attempt < _RETRY_TOTAL:
+                delay = _RETRY_BACKOFF * (2 ** attempt)
+                retry_after = response.headers.get("Retry-After")
+                if retry_after:
+                    try:
+                        delay = max(delay, float(retry_after))
+                    except ValueError:
+                        pass
+                time.sleep(delay)
+                continue
+            try:
+                response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                raise APIStatusError(
+                    _error_message(e.response),
+                    status_code=e.response.status_code,
+                    response=e.response,
+                ) from e
+            return _decode_completion(response.content)
+
+    def close(self):
+        if self._http is not None:
+            self._http.close()
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
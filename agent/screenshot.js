@@ -122,13 +122,17 @@ async function takeScreenshot(url, timeout = 30000) {
     console.log("Waiting for page to stabilize...");
     await page.waitForTimeout(3000);
 
-    // Take screenshot
+    // Take screenshot via a temp file renamed into place, so
+    // screenshot.jpg is never observed half-written
     console.log("Taking screenshot...");
+    const tmp = `screenshot.${process.pid}.tmp.jpg`;
     await page.screenshot({
-      path: "screenshot.jpg",
+      path: tmp,
+      type: "jpeg",
       fullPage: false,
       quality: 90,
     });
+    fs.renameSync(tmp, "screenshot.jpg");
 
     console.log("Screenshot saved as screenshot.jpg");
 
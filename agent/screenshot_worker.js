@@ -0,0 +1,146 @@
+const fs = require("fs");
+const puppeteer = require("puppeteer");
+const readline = require("readline");
+
+// Long-lived screenshot worker: reads one JSON job per line on stdin
+// ({url, timeout, out} or {url, timeout, b64: true}) and replies with
+// one JSON result per line on stdout ({ok, path}, {ok, b64} or
+// {ok, error}). With b64 the JPEG never touches disk. One Chromium
+// instance is reused across jobs, so callers only pay browser startup
+// once per session. All logging goes to stderr to keep the stdout
+// protocol clean.
+
+let browser = null;
+
+function log(message) {
+  console.error(message);
+}
+
+async function getBrowser() {
+  if (!browser || !browser.connected) {
+    log("Launching browser...");
+    browser = await puppeteer.launch({
+      headless: true,
+      args: [
+        "--no-sandbox",
+        "--disable-setuid-sandbox",
+        "--disable-dev-shm-usage",
+        "--disable-gpu",
+        "--disable-web-security",
+        "--disable-features=VizDisplayCompositor",
+        "--no-first-run",
+        "--disable-background-timer-throttling",
+        "--disable-backgrounding-occluded-windows",
+        "--disable-renderer-backgrounding",
+      ],
+      timeout: 60000,
+    });
+    log("Browser launched successfully");
+  }
+  return browser;
+}
+
+async function screenshot(job) {
+  const url = job.url;
+  const timeout = job.timeout || 45000;
+  const out = job.out || "screenshot.jpg";
+
+  if (!url) {
+    throw new Error("Job is missing a url");
+  }
+  new URL(url); // validate format, throws on garbage
+
+  const page = await (await getBrowser()).newPage();
+  try {
+    await page.setViewport({
+      width: 1280,
+      height: 800,
+      deviceScaleFactor: 1,
+    });
+    await page.setUserAgent(
+      "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    );
+    page.setDefaultTimeout(timeout);
+    page.setDefaultNavigationTimeout(timeout);
+
+    log(`Navigating to: ${url}`);
+    try {
+      await page.goto(url, { waitUntil: "domcontentloaded", timeout: timeout });
+    } catch (navigationError) {
+      log(`Direct navigation failed (${navigationError.message}), retrying with networkidle2...`);
+      await page.goto(url, { waitUntil: "networkidle2", timeout: timeout });
+    }
+
+    // Let the page stabilize before capturing, same as screenshot.js
+    await new Promise((resolve) => setTimeout(resolve, 3000));
+
+    log("Taking screenshot...");
+    if (job.b64) {
+      // Keep the JPEG in memory and hand it back base64-encoded; the
+      // caller feeds it straight into the vision request.
+      const b64 = await page.screenshot({
+        type: "jpeg",
+        fullPage: false,
+        quality: 90,
+        encoding: "base64",
+      });
+      return { ok: true, b64: b64 };
+    }
+    // Write to a pid-suffixed temp name and rename into place: the
+    // final path is either absent or a complete JPEG, never a partial
+    // file, and the caller needs no pre-delete.
+    const tmp = `${out}.${process.pid}.tmp.jpg`;
+    await page.screenshot({
+      path: tmp,
+      type: "jpeg",
+      fullPage: false,
+      quality: 90,
+    });
+    fs.renameSync(tmp, out);
+
+    return { ok: true, path: out };
+  } finally {
+    try {
+      await page.close();
+    } catch (closeError) {
+      log(`Error closing page: ${closeError.message}`);
+    }
+  }
+}
+
+async function main() {
+  const rl = readline.createInterface({ input: process.stdin });
+
+  for await (const line of rl) {
+    if (!line.trim()) continue;
+
+    let job;
+    try {
+      job = JSON.parse(line);
+    } catch (parseError) {
+      process.stdout.write(
+        JSON.stringify({ ok: false, error: `Bad job line: ${parseError.message}` }) + "\n"
+      );
+      continue;
+    }
+
+    try {
+      const result = await screenshot(job);
+      process.stdout.write(JSON.stringify(result) + "\n");
+    } catch (error) {
+      process.stdout.write(JSON.stringify({ ok: false, error: error.message }) + "\n");
+    }
+  }
+
+  // stdin closed: the parent is done with us
+  if (browser) {
+    log("Closing browser...");
+    try {
+      await browser.close();
+    } catch (closeError) {
+      log(`Error closing browser: ${closeError.message}`);
+    }
+  }
+}
+
+main();
@@ -0,0 +1,390 @@
+"""Screenshot-and-analyze pipeline.
+
+Drives the Puppeteer screenshot tool (``screenshot.js``) and sends the
+captured page image to an OpenAI-compatible vision model via
+``CustomOpenAIClient``.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from collections import OrderedDict
+
+try:
+    # SIMD base64 (AVX2/NEON); same b64encode API as the stdlib module.
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
+
+try:
+    # libjpeg-turbo binding: SIMD IDCT kernels plus DCT-domain scaling,
+    # so the downscale-recompress step never fully decodes the image.
+    from turbojpeg import TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+try:
+    # Pillow (or the drop-in Pillow-SIMD build) for downscaling
+    # screenshots before upload; without it images go up full size.
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from b64_kernel import build_data_url
+from openai_client import CustomOpenAIClient
+
+logger = logging.getLogger(__name__)
+
+# The vision model resizes internally anyway, so pixels beyond this
+# long edge are pure payload cost.
+MAX_IMAGE_EDGE = 1536
+JPEG_QUALITY = 80
+CACHE_MAX_ENTRIES = 256
+
+if hasattr(_b64, "get_version"):
+    logger.debug("pybase64 %s active (SIMD base64)", _b64.get_version())
+else:
+    logger.debug("pybase64 not installed, using stdlib base64")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class VisionScraper:
+    def __init__(self, client=None, timeout=45000, cache_dir=None):
+        self.client = client or CustomOpenAIClient()
+        self.timeout = timeout
+        self.screenshot_path = os.path.join(SCRIPT_DIR, "screenshot.jpg")
+        # Analyses keyed on blake2b(image + prompt): a repeated page
+        # with an identical screenshot skips the whole vision call.
+        # Pass cache_dir (e.g. ".cache/vision") to also persist hits
+        # across runs.
+        self._analysis_cache = OrderedDict()
+        self.cache_dir = cache_dir
+        # Shared-library handle loaded once per scraper; None means
+        # fall back to the Pillow recompression path.
+        self._turbojpeg = None
+        if TurboJPEG is not None:
+            try:
+                self._turbojpeg = TurboJPEG()
+            except (OSError, RuntimeError):
+                logger.debug("libturbojpeg not available, using Pillow")
+        # Lazily built so aiohttp stays an optional dependency for
+        # purely synchronous callers.
+        self._async_client = None
+        # Long-lived screenshot worker (spawned on first use) so Node +
+        # Chromium startup is paid once per session, not once per URL.
+        self._node = None
+
+    def _ensure_worker(self):
+        if self._node is None or self._node.poll() is not None:
+            self._node = subprocess.Popen(
+                ["node", "screenshot_worker.js"],
+                cwd=SCRIPT_DIR,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                bufsize=1,
+                text=True,
+            )
+        return self._node
+
+    def _get_async_client(self):
+        if self._async_client is None:
+            from async_openai_client import AsyncCustomOpenAIClient
+
+            self._async_client = AsyncCustomOpenAIClient()
+        return self._async_client
+
+    def take_screenshot(self, url, timeout=None, return_base64=True):
+        """Capture a screenshot via the worker.
+
+        With ``return_base64`` (the default) the JPEG never touches
+        disk: the worker base64-encodes it in memory and the result is
+        returned as ASCII bytes ready for the data URL. Pass
+        ``return_base64=False`` to get the on-disk path instead.
+        """
+        timeout = timeout or self.timeout
+        if return_base64:
+            job = {"url": url, "timeout": timeout, "b64": True}
+        else:
+            # No pre-delete: the worker renames a temp file over the
+            # target, so a stale or partial screenshot.jpg can never be
+            # observed.
+            job = {"url": url, "timeout": timeout, "out": self.screenshot_path}
+        worker = self._ensure_worker()
+        worker.stdin.write(json.dumps(job) + "\n")
+        worker.stdin.flush()
+        line = worker.stdout.readline()
+        if not line:
+            raise Exception("Screenshot worker exited unexpectedly")
+        result = json.loads(line)
+        if not result.get("ok"):
+            raise Exception(f"Screenshot failed: {result.get('error')}")
+        if return_base64:
+            return result["b64"].encode("ascii")
+        return result["path"]
+
+    async def aclose(self):
+        """Release the async client's aiohttp session.
+
+        The sync close() cannot await it; callers using the async
+        analyze paths directly should await this when done (the session
+        is rebuilt lazily if used again).
+        """
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    def close(self):
+        """Shut down the screenshot worker (closing stdin ends its loop)."""
+        if self._node is not None and self._node.poll() is None:
+            try:
+                self._node.stdin.close()
+                self._node.wait(timeout=10)
+            except Exception:
+                self._node.terminate()
+        self._node = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def encode_image(self, image_path):
+        """Return the screenshot base64-encoded, as bytes.
+
+        Kept as bytes so callers can splice it into the data URL with a
+        single concat + ASCII decode instead of materializing an extra
+        str copy of a multi-megabyte payload. Only the file-path
+        fallback lands here; the default worker path returns base64
+        directly without touching disk.
+        """
+        # readv into one preallocated buffer sized from fstat: the
+        # image is copied out of the page cache exactly once and
+        # b64encode consumes the memoryview in place. (O_DIRECT was
+        # considered but needs sector-aligned buffers and defeats the
+        # cache the Node worker just warmed.)
+        fd = os.open(image_path, os.O_RDONLY)
+        try:
+            size = os.fstat(fd).st_size
+            if size == 0:
+                return b""
+            buf = bytearray(size)
+            view = memoryview(buf)
+            read = 0
+            while read < size:
+                n = os.readv(fd, [view[read:]])
+                if n == 0:
+                    break
+                read += n
+            return _b64.b64encode(view[:read])
+        finally:
+            os.close(fd)
+
+    def _recompress(self, jpeg_bytes):
+        """Shrink a JPEG for upload: long edge <= MAX_IMAGE_EDGE, quality 80.
+
+        Typically a 3-8x reduction of the base64 payload for desktop
+        screenshots. Returns the input unchanged if no JPEG codec is
+        installed or recompression did not actually help.
+        """
+        if self._turbojpeg is not None:
+            # Header-only decode for the dimensions, then halve in the
+            # DCT domain only when the capture actually exceeds the
+            # limit - default 1280x800 viewports are already under it
+            # and just get requantized, like the Pillow path below.
+            width, height = self._turbojpeg.decode_header(jpeg_bytes)[:2]
+            factor = (1, 2) if max(width, height) > MAX_IMAGE_EDGE else (1, 1)
+            out = self._turbojpeg.scale_with_quality(
+                jpeg_bytes, scaling_factor=factor, quality=JPEG_QUALITY
+            )
+            return out if len(out) < len(jpeg_bytes) else jpeg_bytes
+        if Image is None:
+            return jpeg_bytes
+        im = Image.open(io.BytesIO(jpeg_bytes))
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+        im.thumbnail((MAX_IMAGE_EDGE, MAX_IMAGE_EDGE), Image.LANCZOS)
+        buf = io.BytesIO()
+        im.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        out = buf.getvalue()
+        return out if len(out) < len(jpeg_bytes) else jpeg_bytes
+
+    def _has_jpeg_codec(self):
+        return self._turbojpeg is not None or Image is not None
+
+    def _raw_jpeg(self, image):
+        """Raw JPEG bytes from analyze input (base64 bytes or a path)."""
+        if isinstance(image, bytes):
+            return _b64.b64decode(image)
+        with open(image, "rb") as f:
+            return f.read()
+
+    def _prepare_payload(self, image, prompt):
+        """Normalize analyze input (base64 bytes or path) to its data
+        URL and cache key, recompressing the JPEG when a codec is
+        available.
+
+        When the raw JPEG is in hand, the URL comes from
+        build_data_url, which fuses the data: prefix and the base64
+        encode into one pass over a single preallocated buffer
+        (compiled via Numba when installed). Only the codec-less
+        base64 passthrough still does a plain concat.
+        """
+        if isinstance(image, bytes):
+            if not self._has_jpeg_codec():
+                url = (b"data:image/jpeg;base64," + image).decode("ascii")
+                return url, self._cache_key(image, prompt)
+            jpeg = self._recompress(_b64.b64decode(image))
+        elif not self._has_jpeg_codec():
+            base64_image = self.encode_image(image)
+            url = (b"data:image/jpeg;base64," + base64_image).decode("ascii")
+            return url, self._cache_key(base64_image, prompt)
+        else:
+            with open(image, "rb") as f:
+                jpeg = self._recompress(f.read())
+        return build_data_url(jpeg), self._cache_key(jpeg, prompt)
+
+    @staticmethod
+    def _cache_key(base64_image, prompt):
+        # blake2b is markedly faster than SHA-256 here and 16 bytes is
+        # plenty for a content address.
+        h = hashlib.blake2b(digest_size=16)
+        h.update(base64_image)
+        h.update(prompt.encode("utf-8"))
+        return h.hexdigest()
+
+    def _cache_get(self, key):
+        if key in self._analysis_cache:
+            self._analysis_cache.move_to_end(key)
+            return self._analysis_cache[key]
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, f"{key}.json")
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    analysis = json.load(f)["analysis"]
+                self._analysis_cache[key] = analysis
+                return analysis
+        return None
+
+    def _cache_put(self, key, analysis):
+        self._analysis_cache[key] = analysis
+        self._analysis_cache.move_to_end(key)
+        while len(self._analysis_cache) > CACHE_MAX_ENTRIES:
+            self._analysis_cache.popitem(last=False)
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = os.path.join(self.cache_dir, f"{key}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"analysis": analysis}, f)
+
+    @staticmethod
+    def _build_messages(data_url, prompt):
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": data_url,
+                            "detail": "high",
+                        },
+                    },
+                ],
+            }
+        ]
+
+    def analyze_screenshot(self, image, prompt):
+        """Analyze a screenshot given either base64 bytes or a file path."""
+        # Endpoints with a multipart /vision route take the JPEG raw -
+        # no base64 at all and ~25% fewer bytes on the wire.
+        if getattr(self.client, "supports_multipart", False):
+            jpeg = self._recompress(self._raw_jpeg(image))
+            key = self._cache_key(jpeg, prompt)
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+            completion = self.client.analyze_image_multipart(jpeg, prompt)
+        else:
+            data_url, key = self._prepare_payload(image, prompt)
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+            messages = self._build_messages(data_url, prompt)
+            completion = self.client.chat.completions.create(messages=messages)
+        analysis = completion.choices[0].message.content
+        self._cache_put(key, analysis)
+        return analysis
+
+    def analyze_screenshot_stream(self, image, prompt):
+        """Yield the analysis text incrementally as the model generates it."""
+        data_url, _ = self._prepare_payload(image, prompt)
+        messages = self._build_messages(data_url, prompt)
+        for delta in self.client.chat.completions.create(messages=messages, stream=True):
+            if delta.content:
+                yield delta.content
+
+    def scrape_and_analyze(self, url, prompt):
+        base64_image = self.take_screenshot(url)
+        return self.analyze_screenshot(base64_image, prompt)
+
+    async def take_screenshot_async(self, url, timeout=None, out_dir=None):
+        """Non-blocking variant of take_screenshot.
+
+        ``out_dir`` picks the working directory for screenshot.js (which
+        writes screenshot.jpg into its cwd), so concurrent jobs do not
+        clobber each other's output.
+        """
+        timeout = timeout or self.timeout
+        cwd = out_dir or SCRIPT_DIR
+        proc = await asyncio.create_subprocess_exec(
+            "node",
+            os.path.join(SCRIPT_DIR, "screenshot.js"),
+            url,
+            str(timeout),
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            raise Exception(f"Screenshot failed: {stderr.decode().strip()}")
+        return os.path.join(cwd, "screenshot.jpg")
+
+    async def analyze_screenshot_async(self, image, prompt):
+        """Async analyze; accepts base64 bytes or a file path like the sync one."""
+        data_url, key = self._prepare_payload(image, prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        messages = self._build_messages(data_url, prompt)
+        client = self._get_async_client()
+        completion = await client.chat.completions.create(messages=messages)
+        analysis = completion.choices[0].message.content
+        self._cache_put(key, analysis)
+        return analysis
+
+    async def _one(self, url, prompt):
+        out_dir = tempfile.mkdtemp(prefix="web-agent-")
+        try:
+            image_path = await self.take_screenshot_async(url, out_dir=out_dir)
+            return await self.analyze_screenshot_async(image_path, prompt)
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    async def scrape_and_analyze_many(self, urls, prompt):
+        """Scrape a batch of URLs concurrently; results match url order."""
+        try:
+            return await asyncio.gather(*(self._one(url, prompt) for url in urls))
+        finally:
+            # The aiohttp session must be closed from inside the loop;
+            # it is recreated lazily if another batch follows.
+            await self.aclose()